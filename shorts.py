@@ -12,30 +12,44 @@ while retaining the original behaviour.
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
 import logging
 import math
+import multiprocessing
 import random
+import re
+import subprocess
 import os
+import queue
+import threading
+import zipfile
+from bisect import bisect_right
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import List, Sequence, Tuple
+from typing import Callable, List, Sequence, Tuple
 
+import cv2
 import numpy as np
 from dotenv import load_dotenv
-from moviepy import CompositeVideoClip, VideoFileClip
-from scipy.ndimage import gaussian_filter
-from scenedetect import SceneManager, open_video
+from moviepy import VideoClip, VideoFileClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from scenedetect import FrameTimecode, SceneManager, open_video
 from scenedetect.detectors import ContentDetector
 import librosa
 
 
-# Load environment variables from a .env file if present.
-load_dotenv()
-
 # Configure basic logging. The calling application may override this
 # configuration if a different format is required.
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
+# Detected scene lists are cached here so re-runs skip the full decode pass.
+SCENE_CACHE_DIR = Path(".scene_cache")
+
 
 def _get_env_int(name: str, default: int) -> int:
     """Read an int environment variable with a default and basic validation."""
@@ -44,7 +58,7 @@ def _get_env_int(name: str, default: int) -> int:
         return default
     try:
         return int(value)
-    except Exception:
+    except ValueError:
         logging.warning(
             "Env var %s=%r is not a valid int. Using default %s.", name, value, default
         )
@@ -58,7 +72,7 @@ def _get_env_float(name: str, default: float) -> float:
         return default
     try:
         return float(value)
-    except Exception:
+    except ValueError:
         logging.warning(
             "Env var %s=%r is not a valid float. Using default %s.",
             name,
@@ -68,6 +82,14 @@ def _get_env_float(name: str, default: float) -> float:
         return default
 
 
+def _get_env_str(name: str, default: str) -> str:
+    """Read a string environment variable, ignoring surrounding whitespace."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip()
+
+
 @dataclass(frozen=True)
 class ProcessingConfig:
     """Configuration values used throughout the processing pipeline."""
@@ -81,6 +103,10 @@ class ProcessingConfig:
     min_short_length: int = 15
     max_short_length: int = 179
     max_combined_scene_length: int = 300
+    render_workers: int = 2
+    scene_frame_skip: int = 1
+    video_codec: str = "auto"
+    video_preset: str = "veryfast"
 
     @property
     def middle_short_length(self) -> float:
@@ -89,8 +115,65 @@ class ProcessingConfig:
         return (self.min_short_length + self.max_short_length) / 2
 
 
+def _video_cache_key(video_path: Path, *params: object) -> str:
+    """Return a cache key for results computed from ``video_path`` with ``params``.
+
+    The key includes the file's size and modification time so an edited or
+    replaced video is analysed again.
+    """
+
+    stat = video_path.stat()
+    fields = [video_path.resolve(), stat.st_mtime_ns, stat.st_size, *params]
+    return hashlib.sha1(":".join(map(str, fields)).encode()).hexdigest()
+
+
+def _scene_cache_file(
+    video_path: Path, threshold: float, frame_skip: int, cache_dir: Path
+) -> Path:
+    """Return the cache file for ``video_path`` detected with these settings."""
+
+    return cache_dir / f"{_video_cache_key(video_path, threshold, frame_skip)}.json"
+
+
+def _load_cached_scenes(cache_file: Path) -> List[Tuple] | None:
+    """Load a scene list written by ``_save_cached_scenes`` or return ``None``."""
+
+    if not cache_file.is_file():
+        return None
+    try:
+        data = json.loads(cache_file.read_text())
+        fps = data["fps"]
+        return [
+            (FrameTimecode(start, fps=fps), FrameTimecode(end, fps=fps))
+            for start, end in data["scenes"]
+        ]
+    except (OSError, ValueError, KeyError, TypeError):
+        # json.JSONDecodeError is a ValueError; TypeError covers valid JSON
+        # of the wrong shape.
+        logging.warning("Ignoring unreadable scene cache %s.", cache_file)
+        return None
+
+
+def _save_cached_scenes(cache_file: Path, scene_list: Sequence[Tuple]) -> None:
+    """Store ``scene_list`` as frame numbers plus the video frame rate."""
+
+    fps = scene_list[0][0].get_framerate() if scene_list else None
+    data = {
+        "fps": fps,
+        "scenes": [[start.get_frames(), end.get_frames()] for start, end in scene_list],
+    }
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(data))
+    except OSError:
+        logging.warning("Could not write scene cache %s.", cache_file)
+
+
 def detect_video_scenes(
-    video_path: Path, threshold: float = 27.0
+    video_path: Path,
+    threshold: float = 27.0,
+    cache_dir: Path | None = None,
+    frame_skip: int = 0,
 ) -> Sequence[Tuple] | List:
     """Detect scenes in the provided video file.
 
@@ -100,6 +183,13 @@ def detect_video_scenes(
         Path to the video file.
     threshold: float, optional
         Threshold value for the ``ContentDetector``.
+    cache_dir: Path, optional
+        Directory used to cache detected scene lists between runs. Caching is
+        disabled when ``None``.
+    frame_skip: int, optional
+        Number of frames skipped after each analysed frame. Cuts are then
+        located to within ``frame_skip + 1`` frames, which is ample for
+        picking shorts, while the detector does proportionally less work.
 
     Returns
     -------
@@ -107,21 +197,201 @@ def detect_video_scenes(
         List of ``(start, end)`` timecodes for each detected scene.
     """
 
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = _scene_cache_file(video_path, threshold, frame_skip, cache_dir)
+        cached = _load_cached_scenes(cache_file)
+        if cached is not None:
+            logging.info("Using cached scene list %s", cache_file)
+            return cached
+
     video = open_video(str(video_path))
     scene_manager = SceneManager()
+    # Analyse frames downscaled to ~256 px wide; cuts survive the downscale.
+    scene_manager.auto_downscale = True
     scene_manager.add_detector(ContentDetector(threshold=threshold))
-    scene_manager.detect_scenes(video, show_progress=True)
-    return scene_manager.get_scene_list()
+    # No progress bar: detection runs in the background while the previous
+    # video renders (see process_videos), where bars would interleave.
+    scene_manager.detect_scenes(video, frame_skip=frame_skip, show_progress=False)
+    scene_list = scene_manager.get_scene_list()
+
+    if cache_file is not None:
+        _save_cached_scenes(cache_file, scene_list)
+    return scene_list
+
+
+# The blurred background is rendered at a quarter of the 720 px working width
+# and upscaled afterwards; the sigma is scaled down by the same factor so the
+# result looks like the original sigma=8 blur at 720 px.
+BACKGROUND_BLUR_WIDTH = 180
+BACKGROUND_BLUR_SIGMA = 8 * BACKGROUND_BLUR_WIDTH / 720
+
+
+def blur(
+    image: np.ndarray, sigma: float = 8, out: np.ndarray | None = None
+) -> np.ndarray:
+    """Return a blurred version of ``image``.
+
+    Three passes of a box filter approximate a Gaussian of ``sigma``, with the
+    box width from Wells' formula ``sqrt(12 * sigma**2 / 3 + 1)`` rounded to an
+    odd size so the box stays centred. ``cv2.blur`` costs the same per pixel
+    whatever the width, and it works directly on the native ``uint8`` frames,
+    so the output keeps the dtype and shape of the input.
+
+    The result is written to ``out`` when given (which may be ``image``
+    itself) and returned; otherwise a new array is allocated.
+    """
+
+    width = int(math.sqrt(4 * sigma * sigma + 1))
+    width += 1 - width % 2
+    ksize = (width, width)
+    blurred = cv2.blur(image, ksize, dst=out, borderType=cv2.BORDER_REFLECT101)
+    # The remaining passes run in place on the output.
+    for _ in range(2):
+        cv2.blur(blurred, ksize, dst=blurred, borderType=cv2.BORDER_REFLECT101)
+    return blurred
+
+
+def blurred_background(
+    image: np.ndarray,
+    blur_size: Tuple[int, int],
+    output_size: Tuple[int, int],
+) -> np.ndarray:
+    """Return a blurred background frame of ``output_size`` built from ``image``.
+
+    Downscaling, blurring and upscaling happen in one frame callback so the
+    background stream allocates a single full-size frame instead of one per
+    moviepy ``resized``/``image_transform`` step. Sizes are ``(width, height)``.
+    """
+
+    # Decoded video frames are already uint8; generated clips may not be.
+    image = np.asarray(image, dtype=np.uint8)
+    small = cv2.resize(image, blur_size, interpolation=cv2.INTER_AREA)
+    # The downscaled copy is private to this call, so it is blurred in place.
+    blur(small, sigma=BACKGROUND_BLUR_SIGMA, out=small)
+    return cv2.resize(small, output_size, interpolation=cv2.INTER_LINEAR)
+
+
+def resize_frame(frame: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Resize ``frame`` to ``size`` (``(width, height)``) with OpenCV.
+
+    Area interpolation is used when shrinking and bilinear when enlarging.
+    """
+
+    frame = np.asarray(frame, dtype=np.uint8)
+    shrinking = size[0] < frame.shape[1]
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+    return cv2.resize(frame, size, interpolation=interpolation)
 
 
-def blur(image: np.ndarray) -> np.ndarray:
-    """Return a blurred version of ``image``."""
-    return gaussian_filter(image.astype(float), sigma=8)
+def fill_background(
+    frame: np.ndarray,
+    output_size: Tuple[int, int],
+    blur_size: Tuple[int, int],
+    background_box: "CropBox",
+) -> np.ndarray:
+    """Centre ``frame`` on a blurred background of ``output_size``.
+
+    The background is the ``background_box`` region of ``frame`` itself, so
+    foreground and background come from one decoded source frame instead of
+    two composited streams. ``frame`` must fit inside ``output_size``; sizes
+    are ``(width, height)``.
+    """
+
+    out_w, out_h = output_size
+    frame = np.asarray(frame, dtype=np.uint8)
+    background = blurred_background(background_box.apply(frame), blur_size, output_size)
+
+    height, width = frame.shape[:2]
+    y = (out_h - height) // 2
+    x = (out_w - width) // 2
+    # A single strided copy in numpy's C loop; there is no per-pixel Python
+    # work left here for a JIT to remove.
+    background[y : y + height, x : x + width] = frame
+    return background
 
 
 # --- Audio-based action scoring -------------------------------------------------
 
 
+def _frame_rms(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """Return the RMS of each frame of ``y``, as ``librosa.feature.rms`` does.
+
+    Frames are centred: ``y`` is zero-padded by ``frame_length // 2`` on both
+    sides. When the hop divides the frame length, the squares are summed once
+    per hop-sized block (``einsum`` avoids a squared copy of the signal) and
+    each frame adds up its ``frame_length // hop_length`` blocks, instead of
+    squaring every sample once per overlapping frame.
+    """
+
+    padded = np.pad(y, frame_length // 2)
+    n_frames = 1 + (len(padded) - frame_length) // hop_length
+    if frame_length % hop_length:
+        frames = np.lib.stride_tricks.sliding_window_view(padded, frame_length)
+        power = np.square(frames[::hop_length], dtype=float).mean(axis=1)
+        return np.sqrt(power)
+
+    n_blocks = len(padded) // hop_length
+    blocks = padded[: n_blocks * hop_length].reshape(n_blocks, hop_length)
+    block_power = np.einsum("ij,ij->i", blocks, blocks, dtype=float)
+    power = np.zeros(n_frames)
+    for k in range(frame_length // hop_length):
+        power += block_power[k : k + n_frames]
+    return np.sqrt(power / frame_length)
+
+
+@lru_cache(maxsize=4)
+def _hann_window(n: int) -> np.ndarray:
+    """Return the periodic Hann window of length ``n`` used by ``librosa.stft``.
+
+    The window is ``float32`` like the audio, so windowed frames stay single
+    precision through the FFT. It is cached per length and shared between
+    calls, so it is returned read-only.
+    """
+
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+def _spectral_flux(
+    y: np.ndarray, n_fft: int, hop_length: int, block_frames: int = 128
+) -> np.ndarray:
+    """Return the frame-to-frame spectral flux of ``y``.
+
+    The flux is the L2 distance between the STFT magnitudes of consecutive
+    frames, ``0.0`` for the first frame. Frames match ``librosa.stft``
+    (centred, zero-padded, periodic Hann window). The real FFT runs on
+    ``block_frames`` frames at a time and only the flux is kept, so memory
+    stays bounded instead of holding the complex spectrogram, its magnitude
+    and their difference for the whole video.
+    """
+
+    padded = np.pad(y, n_fft // 2)
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+    window = _hann_window(n_fft)
+    n_frames = len(frames)
+
+    # Scratch buffers reused by every block. Row 0 of ``mag`` holds the last
+    # magnitude of the previous block, so one subtraction covers the block
+    # boundary as well; for the first block it repeats frame 0 (flux 0).
+    windowed = np.empty((block_frames, n_fft), np.float32)
+    mag = np.empty((block_frames + 1, n_fft // 2 + 1), np.float32)
+    diff = np.empty((block_frames, n_fft // 2 + 1), np.float32)
+
+    flux = np.empty(n_frames)
+    for start in range(0, n_frames, block_frames):
+        n = min(block_frames, n_frames - start)
+        np.multiply(frames[start : start + n], window, out=windowed[:n])
+        np.abs(np.fft.rfft(windowed[:n], axis=1), out=mag[1 : n + 1])
+        if start == 0:
+            mag[0] = mag[1]
+        np.subtract(mag[1 : n + 1], mag[:n], out=diff[:n])
+        flux[start : start + n] = np.sqrt(np.einsum("ij,ij->i", diff[:n], diff[:n]))
+        mag[0] = mag[n]
+    return flux
+
+
 def compute_audio_action_profile(
     video_path: Path,
     frame_length: int = 2048,
@@ -136,18 +406,15 @@ def compute_audio_action_profile(
 
     # librosa can read audio directly from mp4
     y, sr = librosa.load(str(video_path), sr=None, mono=True)
+    # Single precision is ample for loudness and flux and halves the memory
+    # traffic of the framing and FFT passes.
+    y = y.astype(np.float32, copy=False)
 
     # RMS (loudness)
-    rms = librosa.feature.rms(
-        y=y,
-        frame_length=frame_length,
-        hop_length=hop_length,
-    )[0]  # shape: (n_frames,)
+    rms = _frame_rms(y, frame_length, hop_length)  # shape: (n_frames,)
 
     # Spectral flux (how much the spectrum changes from frame to frame)
-    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=hop_length))
-    spectral_flux = np.sqrt(((np.diff(S, axis=1) ** 2).sum(axis=0)))
-    spectral_flux = np.concatenate([[0.0], spectral_flux])  # align length
+    spectral_flux = _spectral_flux(y, n_fft=2048, hop_length=hop_length)
 
     def smooth(x: np.ndarray, win: int = 15) -> np.ndarray:
         # Ensure smoothing window does not exceed the signal length to avoid
@@ -183,20 +450,55 @@ def compute_video_action_profile(
     video_path: Path,
     fps: int = 6,
     downscale_factor: int = 4,
+    cache_dir: Path | None = None,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """Compute a fast video-based "action score" over the entire video.
 
     Optimizations:
       - Read frames sequentially via iter_frames(...) at a low analysis fps.
-      - Downscale frames by taking every N-th pixel along each axis to reduce cost.
+      - Downscale frames by taking every N-th pixel along each axis before any
+        per-pixel arithmetic.
       - Compute mean absolute difference in grayscale luma between consecutive frames.
       - Normalize and smooth similarly to the audio profile.
 
+    The profile costs a full decode of the video, so it is stored in
+    ``cache_dir`` (when given) and reused by later runs on the same file.
+
     Returns:
       times  - array of timestamps (seconds) for each sample
       score  - normalized video action score (higher means more motion)
     """
 
+    cache_file = None
+    if cache_dir is not None:
+        key = _video_cache_key(video_path, "motion", fps, downscale_factor)
+        cache_file = cache_dir / f"{key}.npz"
+        if cache_file.is_file():
+            try:
+                with np.load(cache_file) as data:
+                    logging.info("Using cached video action profile %s", cache_file)
+                    return data["times"], data["score"]
+            except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+                # np.load raises EOFError for an empty (truncated) file.
+                logging.warning("Ignoring unreadable profile cache %s.", cache_file)
+
+    times, score = _measure_video_motion(video_path, fps, downscale_factor)
+
+    if cache_file is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with cache_file.open("wb") as fh:
+                np.savez(fh, times=times, score=score)
+        except OSError:
+            logging.warning("Could not write profile cache %s.", cache_file)
+    return times, score
+
+
+def _measure_video_motion(
+    video_path: Path, fps: float, downscale_factor: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode ``video_path`` and return the smoothed motion profile."""
+
     clip = VideoFileClip(str(video_path))
     duration = float(clip.duration)
 
@@ -210,41 +512,42 @@ def compute_video_action_profile(
     if eff_fps <= 0:
         eff_fps = max(1.0, float(fps))
 
-    motions: List[float] = []
-    times: List[float] = []
-
-    prev_gray: np.ndarray | None = None
-
-    frame_iter = clip.iter_frames(fps=eff_fps, dtype="uint8", logger="bar")
-
-    for idx, frame in enumerate(frame_iter):
-        t = idx / eff_fps
-        if t > duration:
-            break
-
-        # Convert to grayscale [0, 1]
-        gray = np.dot(frame[..., :3], [0.299, 0.587, 0.114]).astype(np.float32) / 255.0
-
-        # Downscale: simple striding is sufficient to estimate motion.
-        if downscale_factor > 1:
-            gray = gray[::downscale_factor, ::downscale_factor]
-
-        if prev_gray is None:
-            motions.append(0.0)
-        else:
-            diff = np.mean(np.abs(gray - prev_gray))
-            motions.append(float(diff))
+    # No progress bar: like scene detection, this runs on the background
+    # analysis thread while shorts render (see process_videos).
+    frame_iter = clip.iter_frames(fps=eff_fps, dtype="uint8", logger=None)
+
+    def frame_motions():
+        prev_gray: np.ndarray | None = None
+        for idx, frame in enumerate(frame_iter):
+            if idx / eff_fps > duration:
+                break
+
+            # Downscale: simple striding is sufficient to estimate motion.
+            # Striding before the grayscale conversion gives the same pixels
+            # while converting downscale_factor**2 times fewer of them.
+            if downscale_factor > 1:
+                frame = frame[::downscale_factor, ::downscale_factor]
+
+            # Convert to grayscale [0, 1]
+            gray = (
+                np.dot(frame[..., :3], [0.299, 0.587, 0.114]).astype(np.float32) / 255.0
+            )
 
-        prev_gray = gray
-        times.append(t)
+            if prev_gray is None:
+                yield 0.0
+            else:
+                yield np.mean(np.abs(gray - prev_gray))
+            prev_gray = gray
 
+    # Motion values go straight into a float array instead of a list of
+    # Python floats; sample i is taken at i / eff_fps.
+    motions = np.fromiter(frame_motions(), dtype=float)
     clip.close()
 
-    if not motions:
+    if motions.size == 0:
         return np.array([], dtype=float), np.array([], dtype=float)
 
-    motions = np.asarray(motions, dtype=float)
-    times_arr = np.asarray(times, dtype=float)
+    times_arr = np.arange(motions.size) / eff_fps
 
     # Normalization (z-score)
     motions_norm = (motions - motions.mean()) / (motions.std() + 1e-8)
@@ -262,6 +565,44 @@ def compute_video_action_profile(
     return times_arr, score
 
 
+def scene_action_scores(
+    scenes: Sequence[Tuple],
+    audio_times: np.ndarray,
+    audio_score: np.ndarray,
+    video_times: np.ndarray | None = None,
+    video_score: np.ndarray | None = None,
+    w_audio: float = 0.6,
+    w_video: float = 0.4,
+) -> np.ndarray:
+    """Return the total (summed) action score of every scene in ``scenes``.
+
+    Each profile is summed once into a prefix-sum array; the samples in
+    ``[start, end)`` of each scene are then located for all scenes in one
+    ``np.searchsorted`` call on the sorted ``times``, so scoring K scenes
+    costs O(N + K log N) instead of one pass over the profile per scene.
+    Scenes whose end is not after their start score ``0.0``.
+    """
+
+    n = len(scenes)
+    starts = np.fromiter((scene[0].get_seconds() for scene in scenes), float, count=n)
+    ends = np.fromiter((scene[1].get_seconds() for scene in scenes), float, count=n)
+
+    def _segment_sums(times: np.ndarray, score: np.ndarray) -> np.ndarray:
+        csum = np.concatenate(([0.0], np.cumsum(score, dtype=float)))
+        i0 = np.minimum(np.searchsorted(times, starts), score.size)
+        i1 = np.minimum(np.searchsorted(times, ends), score.size)
+        return csum[i1] - csum[i0]
+
+    totals = _segment_sums(audio_times, audio_score)
+
+    # If video profile wasn't computed, score on audio alone.
+    if video_times is not None and video_score is not None:
+        totals = w_audio * totals + w_video * _segment_sums(video_times, video_score)
+
+    totals[ends <= starts] = 0.0
+    return totals
+
+
 def scene_action_score(
     scene: Tuple,
     audio_times: np.ndarray,
@@ -275,31 +616,21 @@ def scene_action_score(
 
     Now accounts for both audio and video:
       total = w_audio * audio_action + w_video * video_action
-    """
-
-    start_sec = scene[0].get_seconds()
-    end_sec = scene[1].get_seconds()
-
-    if end_sec <= start_sec:
-        return 0.0
-
-    def _segment_sum(times: np.ndarray, score: np.ndarray) -> float:
-        if times.size == 0 or score.size == 0:
-            return 0.0
-        mask = (times >= start_sec) & (times < end_sec)
-        if not np.any(mask):
-            return 0.0
-        return float(score[mask].sum())
-
-    audio_val = _segment_sum(audio_times, audio_score)
 
-    if video_times is None or video_score is None:
-        # If video profile wasn't computed
-        return audio_val
-
-    video_val = _segment_sum(video_times, video_score)
+    Use ``scene_action_scores`` to score many scenes at once.
+    """
 
-    return w_audio * audio_val + w_video * video_val
+    return float(
+        scene_action_scores(
+            [scene],
+            audio_times,
+            audio_score,
+            video_times,
+            video_score,
+            w_audio,
+            w_video,
+        )[0]
+    )
 
 
 def _best_window_single(
@@ -445,6 +776,72 @@ def best_action_window_start(
     return best_start_time
 
 
+@dataclass(frozen=True)
+class CropBox:
+    """Pixel bounds of a crop; ``x1`` and ``y1`` are exclusive."""
+
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    @classmethod
+    def for_ratio(
+        cls,
+        size: Tuple[int, int],
+        ratio_w: int,
+        ratio_h: int,
+        x_center: float,
+        y_center: float,
+    ) -> "CropBox":
+        """Return the largest ``ratio_w:ratio_h`` box inside ``size``.
+
+        The centre of the box is given by ``x_center`` and ``y_center`` as
+        fractions of the width and height; the box is kept inside the frame.
+        """
+
+        width, height = size
+        if width / height > ratio_w / ratio_h:
+            new_width, new_height = round(height * ratio_w / ratio_h), height
+        else:
+            new_width, new_height = width, round(width / ratio_w * ratio_h)
+
+        x0 = min(max(int(width * x_center - new_width / 2), 0), width - new_width)
+        y0 = min(max(int(height * y_center - new_height / 2), 0), height - new_height)
+        return cls(x0, y0, x0 + new_width, y0 + new_height)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Return ``(width, height)`` of the box."""
+
+        return self.x1 - self.x0, self.y1 - self.y0
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """Return a view of ``frame`` limited to the box."""
+
+        return frame[self.y0 : self.y1, self.x0 : self.x1]
+
+
+def map_frames(
+    clip: VideoClip,
+    func: Callable[[np.ndarray], np.ndarray],
+    size: Tuple[int, int],
+) -> VideoClip:
+    """Return a copy of ``clip`` whose frames are ``func(frame)`` of ``size``.
+
+    moviepy's ``image_transform`` and ``cropped`` learn the new size by
+    rendering frame 0 through the whole chain built so far; every geometry
+    step here is known in advance, so the size is set directly instead.
+    Masks are not transformed.
+    """
+
+    get_frame = clip.get_frame
+    new_clip = clip.copy()
+    new_clip.frame_function = lambda t: func(get_frame(t))
+    new_clip.size = size
+    return new_clip
+
+
 def crop_clip(
     clip: VideoFileClip,
     ratio_w: int,
@@ -458,37 +855,216 @@ def crop_clip(
     which are expressed as fractions of the clip's width and height.
     """
 
-    width, height = clip.size
-    current_ratio = width / height
-    target_ratio = ratio_w / ratio_h
+    box = CropBox.for_ratio(clip.size, ratio_w, ratio_h, x_center, y_center)
+    return map_frames(clip, box.apply, box.size)
+
+
+# Memory budget for decoded frames waiting to be encoded: about 20 frames at
+# 1080x1920, 48 at 720x1280.
+PREFETCH_BUFFER_BYTES = 128 * 1024 * 1024
+
+# Moves the MP4 index in front of the media data so a short starts playing
+# before it is fully downloaded. Muxers other than MP4/MOV ignore it.
+FASTSTART_ARGS = ["-movflags", "+faststart"]
+
+# moviepy encodes the audio track to a temporary file before muxing it; a
+# tmpfs keeps that round trip off the disk.
+TEMP_AUDIO_DIR = Path("/dev/shm")
+
+
+def _temp_audio_dir(output_path: Path) -> str:
+    """Return the directory for moviepy's temporary audio file.
+
+    ``TEMP_AUDIO_DIR`` when it is writable, otherwise the directory of
+    ``output_path``. (moviepy's default of ``""`` would put the file in the
+    current working directory.)
+    """
+
+    if TEMP_AUDIO_DIR.is_dir() and os.access(TEMP_AUDIO_DIR, os.W_OK):
+        return str(TEMP_AUDIO_DIR)
+    return str(output_path.parent)
+
+
+class _FramePrefetcher:
+    """Produce a clip's frames on a background thread ahead of the encoder.
+
+    moviepy requests frames strictly in order while writing a video. A reader
+    thread decodes and composites the upcoming frames into a bounded queue while
+    the main thread hands the previous ones to ffmpeg, so decoding/compositing
+    and encoding overlap. The bounded queue provides back-pressure and keeps
+    memory usage fixed. Requests that do not follow the expected order are
+    served directly after stopping the reader thread.
+    """
+
+    def __init__(
+        self,
+        get_frame: Callable[[float], np.ndarray],
+        duration: float,
+        fps: float,
+        maxsize: int = 8,
+    ):
+        self._get_frame = get_frame
+        self._times = [i / fps for i in range(int(duration * fps))]
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._next = 0
+        self._last: Tuple[float, np.ndarray] | None = None
+        self._direct = False
+
+    def _read(self) -> None:
+        for t in self._times:
+            try:
+                item = (t, self._get_frame(t))
+            except Exception as exc:  # surfaced in the consumer thread
+                item = (t, exc)
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if self._stop.is_set() or isinstance(item[1], Exception):
+                return
+
+    def __call__(self, t: float) -> np.ndarray:
+        if self._last is not None and t == self._last[0]:
+            return self._last[1]
+        if (
+            self._direct
+            or self._next >= len(self._times)
+            or t != self._times[self._next]
+        ):
+            self.close()
+            return self._get_frame(t)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._read, daemon=True)
+            self._thread.start()
+
+        frame_t, frame = self._queue.get()
+        if isinstance(frame, Exception):
+            raise frame
+        self._next += 1
+        self._last = (frame_t, frame)
+        return frame
+
+    def close(self) -> None:
+        """Stop the reader thread; later requests are served directly."""
+
+        self._direct = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+@lru_cache(maxsize=None)
+def nvenc_available() -> bool:
+    """Return ``True`` if ffmpeg can encode H.264 on an NVIDIA GPU.
+
+    A tiny test encode is used instead of only listing encoders, because builds
+    with ``h264_nvenc`` compiled in still fail on machines without a usable GPU.
+    The result is cached for the lifetime of the process.
+    """
 
-    if current_ratio > target_ratio:
-        new_width = round(height * ratio_w / ratio_h)
-        return clip.cropped(
-            width=new_width,
-            height=height,
-            x_center=width * x_center,
-            y_center=height * y_center,
+    try:
+        result = subprocess.run(
+            [
+                FFMPEG_BINARY,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "color=size=256x256:duration=0.1",
+                "-c:v",
+                "h264_nvenc",
+                "-f",
+                "null",
+                "-",
+            ],
+            capture_output=True,
+            timeout=30,
         )
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0
 
-    new_height = round(width / ratio_w * ratio_h)
-    return clip.cropped(
-        width=width,
-        height=new_height,
-        x_center=width * x_center,
-        y_center=height * y_center,
-    )
+
+def video_encoder(config: ProcessingConfig) -> Tuple[str, str, List[str]]:
+    """Return ``(codec, preset, extra ffmpeg arguments)`` for the video stream.
+
+    A ``config.video_codec`` of ``"auto"`` selects NVENC when it is available
+    and ``libx264`` on the CPU otherwise. NVENC always uses its own ``p4``
+    preset; any other codec uses ``config.video_preset``.
+    """
+
+    codec = config.video_codec
+    if codec == "auto":
+        codec = "h264_nvenc" if nvenc_available() else "libx264"
+    if codec == "h264_nvenc":
+        return codec, "p4", ["-rc", "vbr", "-cq", "23"]
+    return codec, config.video_preset, []
+
+
+def _write_video(
+    clip: VideoFileClip,
+    output_path: Path,
+    fps: float,
+    threads: int | None = None,
+    encoder: Tuple[str, str, List[str]] | None = None,
+) -> None:
+    """Encode ``clip`` to ``output_path`` with ``encoder`` and AAC audio.
+
+    ``encoder`` is a ``video_encoder`` result; ``None`` uses the defaults.
+
+    Frames of moviepy clips are produced by a ``_FramePrefetcher`` reader
+    thread while moviepy feeds ffmpeg from the calling thread. Up to
+    ``PREFETCH_BUFFER_BYTES`` of frames are buffered between the two, so a
+    short stall on the encoder side does not stop decoding.
+    """
+
+    prefetcher = None
+    writer_clip = clip
+    if isinstance(clip, VideoClip):
+        width, height = clip.size
+        maxsize = max(2, PREFETCH_BUFFER_BYTES // (width * height * 3))
+        prefetcher = _FramePrefetcher(clip.get_frame, clip.duration, fps, maxsize)
+        writer_clip = clip.with_updated_frame_function(prefetcher)
+    codec, preset, ffmpeg_params = encoder or video_encoder(ProcessingConfig())
+    try:
+        writer_clip.write_videofile(
+            str(output_path),
+            codec=codec,
+            audio_codec="aac",
+            fps=fps,
+            preset=preset,
+            ffmpeg_params=[*ffmpeg_params, *FASTSTART_ARGS],
+            temp_audiofile_path=_temp_audio_dir(output_path),
+            threads=threads,
+            logger=None,
+        )
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
 
 
 def render_video(
     clip: VideoFileClip,
     video_file_name: Path,
     output_dir: Path,
-    depth: int = 0,
     max_error_depth: int = 3,
+    threads: int | None = None,
+    encoder: Tuple[str, str, List[str]] | None = None,
 ) -> None:
     """Render ``clip`` to ``output_dir``
 
+    Only ``OSError`` (which moviepy raises when ffmpeg fails or its pipe
+    breaks) triggers a retry; other exceptions point at bugs and propagate
+    immediately.
+
     Parameters
     ----------
     clip:
@@ -497,48 +1073,47 @@ def render_video(
         Name of the output file.
     output_dir:
         Directory where the output will be written.
-    depth:
-        Current retry depth used to limit recursion.
     max_error_depth:
         Maximum number of retries permitted before surfacing an error.
+    threads:
+        Number of encoder threads, or ``None`` to let ffmpeg decide.
+    encoder:
+        ``(codec, preset, extra ffmpeg arguments)`` from ``video_encoder``;
+        ``None`` uses the default configuration.
     """
 
-    try:
-        clip.write_videofile(
-            str(output_dir / video_file_name.name),
-            codec="libx264",
-            audio_codec="aac",
-            fps=min(getattr(clip, "fps", 60), 60),
-        )
-    except Exception:  # pragma: no cover - logging only
-        if depth < max_error_depth:
+    output_path = output_dir / video_file_name.name
+    fps = min(getattr(clip, "fps", 60), 60)
+    # A negative depth (e.g. from MAX_ERROR_DEPTH) still gets one attempt.
+    for attempt in range(max(max_error_depth, 0) + 1):
+        try:
+            _write_video(clip, output_path, fps=fps, threads=threads, encoder=encoder)
+            return
+        except OSError:
+            if attempt >= max_error_depth:
+                logging.exception("Rendering failed after multiple attempts.")
+                raise
             logging.exception("Rendering failed, retrying...")
-            render_video(
-                clip,
-                video_file_name,
-                output_dir,
-                depth + 1,
-                max_error_depth,
-            )
-        else:
-            logging.exception("Rendering failed after multiple attempts.")
-            raise
+
+
+# Output resolutions by clip width: widths below BACKGROUND_WIDTH_LIMITS[i]
+# (and at or above the previous limit) render at BACKGROUND_RESOLUTIONS[i];
+# wider clips get the last entry.
+BACKGROUND_WIDTH_LIMITS = (840, 1020, 1320, 1680, 2040)
+BACKGROUND_RESOLUTIONS = (
+    (720, 1280),
+    (900, 1600),
+    (1080, 1920),
+    (1440, 2560),
+    (1800, 3200),
+    (2160, 3840),
+)
 
 
 def select_background_resolution(width: int) -> Tuple[int, int]:
     """Choose an output resolution based on the clip width."""
 
-    if width < 840:
-        return 720, 1280
-    if width < 1020:
-        return 900, 1600
-    if width < 1320:
-        return 1080, 1920
-    if width < 1680:
-        return 1440, 2560
-    if width < 2040:
-        return 1800, 3200
-    return 2160, 3840
+    return BACKGROUND_RESOLUTIONS[bisect_right(BACKGROUND_WIDTH_LIMITS, width)]
 
 
 def get_final_clip(
@@ -564,32 +1139,259 @@ def get_final_clip(
 
     width, height = result_clip.size
     bg_w, bg_h = select_background_resolution(width)
-    result_clip = result_clip.resized(width=bg_w)
+    # Even height: yuv420p output (see build_filter_graph) needs even sizes.
+    fg_size = (bg_w, int(height * bg_w / width) // 2 * 2)
+    if fg_size != (width, height):
+        result_clip = map_frames(
+            result_clip, partial(resize_frame, size=fg_size), fg_size
+        )
+
+    if abs(width / height - 1) < 1e-3:
+        # A square foreground covers the square background completely, so
+        # decoding, blurring and compositing a background would be wasted.
+        return result_clip
 
     if width >= height:
-        background_clip = clip.subclipped(start_point, start_point + final_clip_length)
-        background_clip = crop_clip(
-            background_clip, 1, 1, config.x_center, config.y_center
+        # Blurred bands above and below the foreground, cut from the same frame.
+        background_box = CropBox.for_ratio(
+            fg_size, 1, 1, config.x_center, config.y_center
         )
-        background_clip = background_clip.resized(width=720, height=720)
-        background_clip = background_clip.image_transform(blur)
-        background_clip = background_clip.resized(width=bg_w, height=bg_w)
-        result_clip = CompositeVideoClip(
-            [background_clip, result_clip.with_position("center")]
+        return map_frames(
+            result_clip,
+            partial(
+                fill_background,
+                output_size=(bg_w, bg_w),
+                blur_size=(BACKGROUND_BLUR_WIDTH, BACKGROUND_BLUR_WIDTH),
+                background_box=background_box,
+            ),
+            (bg_w, bg_w),
         )
-    elif width / 9 < height / 16:
-        background_clip = clip.subclipped(start_point, start_point + final_clip_length)
-        background_clip = crop_clip(
-            background_clip, 9, 16, config.x_center, config.y_center
+    if width / 9 < height / 16:
+        # Narrower than 9:16: at ``bg_w`` wide the foreground is taller than the
+        # 9:16 frame and would hide any background, so only cut it to ``bg_h``.
+        y0 = (fg_size[1] - bg_h) // 2
+        box = CropBox(0, y0, bg_w, y0 + bg_h)
+        return map_frames(result_clip, box.apply, box.size)
+
+    return result_clip
+
+
+def build_filter_graph(
+    size: Tuple[int, int],
+    fps: float,
+    config: ProcessingConfig,
+) -> str | None:
+    """Return an ffmpeg ``-filter_complex`` graph matching ``get_final_clip``.
+
+    The graph reads ``[0:v]`` and labels its output ``[v]``; trimming is left
+    to the input-side ``-ss``/``-t`` options of the ffmpeg command. ``None``
+    is returned when the source needs no cropping, scaling or compositing.
+    """
+
+    width, height = size
+    steps = []
+    target_ratio = config.target_ratio_w / config.target_ratio_h
+    if width / height > target_ratio:
+        box = CropBox.for_ratio(
+            size,
+            config.target_ratio_w,
+            config.target_ratio_h,
+            config.x_center,
+            config.y_center,
         )
-        background_clip = background_clip.resized(width=720, height=1280)
-        background_clip = background_clip.image_transform(blur)
-        background_clip = background_clip.resized(width=bg_w, height=bg_h)
-        result_clip = CompositeVideoClip(
-            [background_clip, result_clip.with_position("center")]
+        width, height = box.x1 - box.x0, box.y1 - box.y0
+        steps.append(f"crop={width}:{height}:{box.x0}:{box.y0}")
+
+    bg_w, bg_h = select_background_resolution(width)
+    # Kept identical to get_final_clip; libx264 rejects odd heights in yuv420p.
+    fg_size = (bg_w, int(height * bg_w / width) // 2 * 2)
+    if fg_size != (width, height):
+        flags = "area" if bg_w < width else "bilinear"
+        steps.append(f"scale={fg_size[0]}:{fg_size[1]}:flags={flags}")
+    if fps > 60:
+        steps.append("fps=60")
+
+    if width >= height and abs(width / height - 1) >= 1e-3:
+        box = CropBox.for_ratio(fg_size, 1, 1, config.x_center, config.y_center)
+        chain = ",".join(steps + ["split[fg][full]"])
+        return (
+            f"[0:v]{chain};"
+            f"[full]crop={box.x1 - box.x0}:{box.y1 - box.y0}:{box.x0}:{box.y0},"
+            f"scale={BACKGROUND_BLUR_WIDTH}:{BACKGROUND_BLUR_WIDTH}:flags=area,"
+            f"gblur=sigma={BACKGROUND_BLUR_SIGMA},"
+            f"scale={bg_w}:{bg_w}:flags=bilinear[bg];"
+            "[bg][fg]overlay=(W-w)/2:(H-h)/2[v]"
         )
+    if width / 9 < height / 16:
+        steps.append(f"crop={bg_w}:{bg_h}:0:{(fg_size[1] - bg_h) // 2}")
 
-    return result_clip
+    if not steps:
+        return None
+    return f"[0:v]{','.join(steps)}[v]"
+
+
+# Containers whose muxers write an edit list, so a stream copy can be trimmed
+# exactly on playback.
+STREAM_COPY_SUFFIXES = (".mp4", ".mov")
+
+# Largest gap (seconds) between a cut and the next keyframe for the cut to
+# count as starting on that keyframe; container timestamps are often only
+# millisecond precise.
+KEYFRAME_TOLERANCE = 1e-3
+
+
+def starts_on_keyframe(video_file: Path, start_point: float) -> bool:
+    """Return whether ``video_file`` has a video keyframe at ``start_point``.
+
+    ffmpeg decodes only keyframes from ``start_point`` on and reports the
+    first one with ``showinfo``; its timestamp is relative to the seek point.
+    Any probe failure counts as "no keyframe".
+    """
+
+    try:
+        result = subprocess.run(
+            [
+                FFMPEG_BINARY,
+                "-hide_banner",
+                "-skip_frame",
+                "nokey",
+                "-ss",
+                str(start_point),
+                "-i",
+                str(video_file),
+                "-map",
+                "0:v:0",
+                "-frames:v",
+                "1",
+                "-vf",
+                "showinfo",
+                "-f",
+                "null",
+                "-",
+            ],
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return False
+    match = re.search(r"pts_time:(\S+)", result.stderr)
+    if result.returncode != 0 or match is None:
+        return False
+    try:
+        return abs(float(match.group(1))) <= KEYFRAME_TOLERANCE
+    except ValueError:
+        return False
+
+
+def can_stream_copy(video_file: Path, start_point: float, output_path: Path) -> bool:
+    """Return whether a cut from ``start_point`` can copy the streams as is.
+
+    A copy always starts at a keyframe. Only MP4/MOV outputs hide a lead-in
+    before ``start_point`` with an edit list, and even there the cut is
+    exact only when it starts on a keyframe, so both are required.
+    """
+
+    return output_path.suffix.lower() in STREAM_COPY_SUFFIXES and starts_on_keyframe(
+        video_file, start_point
+    )
+
+
+def render_with_filter_graph(
+    video_file: Path,
+    start_point: float,
+    length: float,
+    filter_graph: str | None,
+    output_path: Path,
+    threads: int | None = None,
+    encoder: Tuple[str, str, List[str]] | None = None,
+) -> None:
+    """Cut, transform and encode a short with a single ffmpeg process.
+
+    With a ``filter_graph`` of ``None`` no filtering is needed. The streams
+    are then copied without re-encoding when the output is MP4/MOV and
+    ``start_point`` falls on a keyframe (see ``can_stream_copy``); otherwise
+    a copy would start at the preceding keyframe and carry that lead-in, so
+    the video is re-encoded unfiltered instead. ``threads`` limits the
+    encoder threads; ``None`` leaves the choice to ffmpeg. ``encoder`` is a
+    ``video_encoder`` result; ``None`` uses the defaults.
+
+    Raises ``subprocess.CalledProcessError`` when ffmpeg fails and ``OSError``
+    when it cannot be started.
+    """
+
+    if filter_graph is None and can_stream_copy(video_file, start_point, output_path):
+        output_args = [
+            "-map",
+            "0:v:0",
+            "-map",
+            "0:a?",
+            "-c",
+            "copy",
+        ]
+    else:
+        codec, preset, ffmpeg_params = encoder or video_encoder(ProcessingConfig())
+        if filter_graph is None:
+            video_args = ["-map", "0:v:0"]
+        else:
+            video_args = ["-filter_complex", filter_graph, "-map", "[v]"]
+        output_args = [
+            *video_args,
+            "-map",
+            "0:a?",
+            "-c:v",
+            codec,
+            "-preset",
+            preset,
+            *ffmpeg_params,
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "aac",
+        ]
+
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            # Both as input options: -ss seeks through the container index
+            # (and still trims to the exact frame when re-encoding), -t stops
+            # demuxing and decoding the source at the end of the window.
+            "-ss",
+            str(start_point),
+            "-t",
+            str(length),
+            "-i",
+            str(video_file),
+            *output_args,
+            *(["-threads", str(threads)] if threads else []),
+            *FASTSTART_ARGS,
+            str(output_path),
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+
+def _first_reaching(
+    ends: np.ndarray, lo: int, hi: int, origin: float, cap: float
+) -> int:
+    """Return the first index in ``[lo, hi)`` with ``ends[i] - origin >= cap``.
+
+    ``ends`` is sorted, so a binary search finds the candidate in O(log n);
+    the result is then nudged so it matches the subtraction exactly, since
+    ``ends[i] >= origin + cap`` can round differently. Returns ``hi`` when no
+    scene reaches the cap.
+    """
+
+    i = lo + int(np.searchsorted(ends[lo:hi], origin + cap))
+    while i > lo and ends[i - 1] - origin >= cap:
+        i -= 1
+    while i < hi and ends[i] - origin < cap:
+        i += 1
+    return i
 
 
 def combine_scenes(scene_list: Sequence[Tuple], config: ProcessingConfig) -> List[List]:
@@ -606,93 +1408,78 @@ def combine_scenes(scene_list: Sequence[Tuple], config: ProcessingConfig) -> Lis
     if not scene_list:
         return []
 
-    def is_small(scene) -> bool:
-        return (
-            scene[1].get_seconds() - scene[0].get_seconds()
-        ) < config.min_short_length
-
     n = len(scene_list)
-    out: List[List] = []
-
-    # Initialize first run
+    starts = np.fromiter((s.get_seconds() for s, _ in scene_list), float, count=n)
+    ends = np.fromiter((e.get_seconds() for _, e in scene_list), float, count=n)
+    is_small = (ends - starts) < config.min_short_length
+    cap = config.max_combined_scene_length
+
+    # Contiguous runs of same-type scenes as inclusive [first, last] indices.
+    breaks = np.flatnonzero(np.diff(is_small.astype(np.int8))) + 1
+    run_firsts = np.concatenate(([0], breaks)).tolist()
+    run_lasts = (np.concatenate((breaks, [n])) - 1).tolist()
+
+    # Run boundaries are tracked as indices into ``edges`` and only turned back
+    # into timecode objects at the end: index ``k < n`` is the start of scene
+    # ``k`` and ``k >= n`` is the end of scene ``k - n``.
+    edges = np.concatenate([starts, ends])
+    # Python floats for the scalar lookups done once per run.
+    edge_secs = edges.tolist()
+    pairs: List[Tuple[int, int]] = []
+
+    # The pending run may extend over several same-type runs when short
+    # interior runs are merged forward.
     run_start_idx = 0
-    run_type_small = is_small(scene_list[0])
-    run_start_time = scene_list[0][0]
-    run_end_time = scene_list[0][1]
-
-    for i in range(1, n):
-        current_small = is_small(scene_list[i])
-        if current_small == run_type_small:
-            # Same-type run continues; extend end.
-            run_end_time = scene_list[i][1]
-
-            # If it's a short-scenes run that gets very long, flush it.
-            if run_type_small:
-                run_duration = run_end_time.get_seconds() - run_start_time.get_seconds()
-                if run_duration > config.max_combined_scene_length:
-                    # Exceeded cap: flush up to the end of the previous scene to avoid overlap
-                    prev_end_time = scene_list[i - 1][1]
-                    out.append([run_start_time, prev_end_time])
-                    # Start a new run from current scene
-                    run_start_idx = i
-                    run_start_time = scene_list[i][0]
-                    run_end_time = scene_list[i][1]
-                elif run_duration == config.max_combined_scene_length:
-                    is_last_scene = i == n - 1
-                    if is_last_scene:
-                        # At the very end, close at previous boundary so the final tiny tail
-                        # (current scene) remains a boundary run which can be dropped by threshold.
-                        prev_end_time = scene_list[i - 1][1]
-                        out.append([run_start_time, prev_end_time])
-                        run_start_idx = i
-                        run_start_time = scene_list[i][0]
-                        run_end_time = scene_list[i][1]
-                    else:
-                        # Exactly at cap and not the last scene: we can safely include current scene
-                        # to reach the cap precisely.
-                        out.append([run_start_time, run_end_time])
-                        # Start new run at the next scene. Its start equals current end.
-                        run_start_idx = i + 1
-                        run_start_time = scene_list[i][1]
-                        run_end_time = scene_list[i][1]
-        else:
-            # Run ends at i-1; decide how to handle it.
-            run_end_idx = i - 1
-            run_duration = run_end_time.get_seconds() - run_start_time.get_seconds()
-            is_boundary = (run_start_idx == 0) or (run_end_idx == n - 1)
+    run_start = 0
+
+    for first, last in zip(run_firsts, run_lasts):
+        if first > 0:
+            # The pending run ends right before this type change.
+            run_duration = edge_secs[n + first - 1] - edge_secs[run_start]
+            at_head = run_start_idx == 0
             threshold = (
-                config.middle_short_length if is_boundary else config.min_short_length
+                config.middle_short_length if at_head else config.min_short_length
             )
-
             if run_duration >= threshold:
-                out.append([run_start_time, run_end_time])
-                # Start a new run at i
-                run_start_idx = i
-                run_type_small = current_small
-                run_start_time = scene_list[i][0]
-                run_end_time = scene_list[i][1]
+                pairs.append((run_start, n + first - 1))
+                run_start_idx = run_start = first
+            elif at_head:
+                # Too short at the very start: drop this head run.
+                run_start_idx = run_start = first
+            # Otherwise a too short interior run is merged with this one by
+            # carrying its start forward.
+
+        if not is_small[first] or edge_secs[n + last] - edge_secs[run_start] < cap:
+            continue
+
+        # A short-scenes run that gets very long is flushed at the cap.
+        lo = first + 1
+        while lo <= last:
+            i = _first_reaching(ends, lo, last + 1, edge_secs[run_start], cap)
+            if i > last:
+                break
+            if edge_secs[n + i] - edge_secs[run_start] > cap or i == n - 1:
+                # Exceeded the cap, or reached it exactly on the very last scene:
+                # close at the previous boundary so the tail starts a new run
+                # (at the end it remains a boundary run dropped by threshold).
+                pairs.append((run_start, n + i - 1))
+                run_start_idx = run_start = i
             else:
-                # Too short run.
-                if is_boundary and run_start_idx == 0:
-                    # At the very start: drop this head run (keep original behavior)
-                    run_start_idx = i
-                    run_type_small = current_small
-                    run_start_time = scene_list[i][0]
-                    run_end_time = scene_list[i][1]
-                else:
-                    # Interior: merge with the next run by carrying the start forward.
-                    run_type_small = current_small
-                    run_end_time = scene_list[i][1]
-                    # Note: keep run_start_idx/time unchanged to include previous run.
+                # Exactly at the cap: include the current scene and start the
+                # next run at its end.
+                pairs.append((run_start, n + i))
+                run_start_idx = i + 1
+                run_start = n + i
+            lo = i + 1
 
     # Flush the final run (boundary)
-    final_duration = run_end_time.get_seconds() - run_start_time.get_seconds()
-    is_boundary = True  # the last run always reaches the end
-    threshold = config.middle_short_length if is_boundary else config.min_short_length
-    if final_duration >= threshold:
-        out.append([run_start_time, run_end_time])
+    if edge_secs[-1] - edge_secs[run_start] >= config.middle_short_length:
+        pairs.append((run_start, 2 * n - 1))
+
+    def edge(k: int):
+        return scene_list[k][0] if k < n else scene_list[k - n][1]
 
-    return out
+    return [[edge(a), edge(b)] for a, b in pairs]
 
 
 class _SecondsTime:
@@ -750,13 +1537,193 @@ def split_overlong_scenes(
     return result
 
 
-def process_video(video_file: Path, config: ProcessingConfig, output_dir: Path) -> None:
-    """Process a single video file and generate short clips."""
+@dataclass(frozen=True)
+class VideoInfo:
+    """Stream properties of a source video.
+
+    ``fps`` is ``None`` when ffmpeg reports no frame rate for the stream.
+    """
+
+    size: Tuple[int, int]
+    fps: float | None
+    duration: float
+
+
+@lru_cache(maxsize=None)
+def probe_video(video_file: Path) -> VideoInfo:
+    """Return the size, frame rate and duration of ``video_file``.
+
+    The result is cached per process, so rendering several shorts from one
+    source probes it once instead of opening a ``VideoFileClip`` per short.
+    """
+
+    infos = ffmpeg_parse_infos(str(video_file))
+    width, height = infos["video_size"]
+    # moviepy reports display-matrix rotations as negative angles too.
+    if abs(infos.get("video_rotation", 0)) in (90, 270):
+        width, height = height, width
+    return VideoInfo((width, height), infos.get("video_fps"), infos["duration"])
+
+
+def encoder_threads(render_workers: int) -> int:
+    """Return the encoder thread count for each of ``render_workers`` renders.
+
+    The CPU cores are split between the concurrent encoders so they do not
+    oversubscribe the machine.
+    """
+
+    return max(1, (os.cpu_count() or 1) // max(1, render_workers))
+
+
+def render_scene(
+    video_file: Path,
+    start_point: float,
+    short_length: int,
+    render_file_name: str,
+    config: ProcessingConfig,
+    output_dir: Path,
+) -> None:
+    """Cut a single short out of ``video_file`` and render it.
+
+    The short is rendered by one ffmpeg filter graph; if ffmpeg fails, the
+    moviepy pipeline is used instead.
+
+    Only the file path is passed in, rather than an open clip, because moviepy
+    clips cannot be pickled; this lets the function run in worker processes.
+    The source is opened with moviepy only for the fallback.
+    """
+
+    info = probe_video(video_file)
+    threads = encoder_threads(config.render_workers)
+    encoder = video_encoder(config)
+    if info.fps is None:
+        # The filter graph needs the source frame rate to decide on fps
+        # conversion.
+        logging.warning(
+            "No frame rate reported for %s, rendering with moviepy.", video_file
+        )
+    else:
+        filter_graph = build_filter_graph(info.size, info.fps, config)
+        try:
+            render_with_filter_graph(
+                video_file,
+                start_point,
+                short_length,
+                filter_graph,
+                output_dir / Path(render_file_name).name,
+                threads=threads,
+                encoder=encoder,
+            )
+            return
+        except (OSError, subprocess.CalledProcessError) as exc:
+            stderr = getattr(exc, "stderr", None) or b""
+            logging.warning(
+                "ffmpeg filter graph render failed (%s), falling back to moviepy. %s",
+                exc,
+                stderr.decode(errors="replace").strip(),
+            )
+
+    video_clip = VideoFileClip(str(video_file))
+    try:
+        final_clip = get_final_clip(video_clip, start_point, short_length, config)
+        render_video(
+            final_clip,
+            Path(render_file_name),
+            output_dir,
+            max_error_depth=config.max_error_depth,
+            threads=threads,
+            encoder=encoder,
+        )
+    finally:
+        video_clip.close()
+
+
+def render_pool(workers: int) -> ProcessPoolExecutor:
+    """Return a process pool of ``workers`` processes for ``render_scene``.
+
+    Workers are spawned rather than forked: the analysis thread of
+    ``process_videos`` is usually running when they start, and forking a
+    multi-threaded process can leave a child holding locks that thread owned.
+    """
+
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def render_scenes(
+    video_file: Path,
+    tasks: Sequence[Tuple[float, int, str]],
+    config: ProcessingConfig,
+    output_dir: Path,
+    executor: Executor | None = None,
+) -> None:
+    """Render ``(start_point, short_length, render_file_name)`` tasks.
+
+    Up to ``config.render_workers`` shorts are encoded concurrently in
+    separate processes; with a single worker everything runs in-process.
+    Work goes to ``executor`` when given, otherwise to a process pool created
+    for this call.
+    """
+
+    workers = min(config.render_workers, len(tasks))
+    if workers <= 1:
+        for start_point, short_length, render_file_name in tasks:
+            render_scene(
+                video_file,
+                start_point,
+                short_length,
+                render_file_name,
+                config,
+                output_dir,
+            )
+        return
+
+    with nullcontext(executor) if executor else render_pool(workers) as pool:
+        futures = [
+            pool.submit(
+                render_scene,
+                video_file,
+                start_point,
+                short_length,
+                render_file_name,
+                config,
+                output_dir,
+            )
+            for start_point, short_length, render_file_name in tasks
+        ]
+        for future in futures:
+            future.result()
+
+
+def _scene_summary(scene: Sequence) -> Tuple[float, str, int, str, int]:
+    """Return ``(duration, start timecode, start frame, end timecode, end frame)``."""
+
+    start, end = scene[0], scene[1]
+    return (
+        end.get_seconds() - start.get_seconds(),
+        start.get_timecode(),
+        start.get_frames(),
+        end.get_timecode(),
+        end.get_frames(),
+    )
+
+
+def plan_shorts(
+    video_file: Path, config: ProcessingConfig
+) -> List[Tuple[float, int, str]]:
+    """Analyse ``video_file`` and choose the shorts to cut from it.
+
+    Returns ``(start_point, short_length, render_file_name)`` tasks for
+    ``render_scenes``.
+    """
 
     logging.info("\nProcess: %s", video_file.name)
 
     logging.info("Detecting scenes...")
-    scene_list = detect_video_scenes(video_file)
+    scene_list = detect_video_scenes(
+        video_file, cache_dir=SCENE_CACHE_DIR, frame_skip=config.scene_frame_skip
+    )
 
     logging.info("Computing audio action profile...")
     audio_times, audio_score = compute_audio_action_profile(video_file)
@@ -766,72 +1733,57 @@ def process_video(video_file: Path, config: ProcessingConfig, output_dir: Path)
         video_file,
         fps=4,  # lower analysis fps for speed (3–6 is a good range)
         downscale_factor=6,  # strong spatial downscale (4–8) for faster motion estimation
+        cache_dir=SCENE_CACHE_DIR,
     )
 
     processed_scene_list = combine_scenes(scene_list, config)
     processed_scene_list = split_overlong_scenes(processed_scene_list, config)
 
+    scores = scene_action_scores(
+        processed_scene_list, audio_times, audio_score, video_times, video_score
+    )
+
+    # Timecodes and frame numbers are read once per scene for all three lists.
+    summaries = [_scene_summary(scene) for scene in processed_scene_list]
+
     logging.info("Scenes list with action scores:")
-    for i, scene in enumerate(processed_scene_list, start=1):
-        duration = scene[1].get_seconds() - scene[0].get_seconds()
-        score_val = scene_action_score(
-            scene, audio_times, audio_score, video_times, video_score
-        )
+    for i, (summary, score_val) in enumerate(zip(summaries, scores), start=1):
         logging.info(
             "    Scene %2d: Duration %5.1f s, ActionScore %7.3f,"
             " Start %s / Frame %d, End %s / Frame %d",
             i,
-            duration,
+            summary[0],
             score_val,
-            scene[0].get_timecode(),
-            scene[0].get_frames(),
-            scene[1].get_timecode(),
-            scene[1].get_frames(),
+            *summary[1:],
         )
 
-    # Sort by action score, not by length
-    sorted_processed_scene_list = sorted(
-        processed_scene_list,
-        key=lambda s: scene_action_score(
-            s, audio_times, audio_score, video_times, video_score
-        ),
-        reverse=True,
-    )
+    # Sort by action score, not by length. The stable sort keeps tied scenes in
+    # their original order, as sorted(..., reverse=True) did.
+    order = np.argsort(-scores, kind="stable")
 
     logging.info("Sorted scenes list (by action score):")
-    for i, scene in enumerate(sorted_processed_scene_list, start=1):
-        duration = scene[1].get_seconds() - scene[0].get_seconds()
-        score_val = scene_action_score(
-            scene, audio_times, audio_score, video_times, video_score
-        )
+    for i, j in enumerate(order, start=1):
         logging.info(
             "    Scene %2d: ActionScore %7.3f, Duration %5.1f s,"
             " Start %s / Frame %d, End %s / Frame %d",
             i,
-            score_val,
-            duration,
-            scene[0].get_timecode(),
-            scene[0].get_frames(),
-            scene[1].get_timecode(),
-            scene[1].get_frames(),
+            scores[j],
+            *summaries[j],
         )
 
-    video_clip = VideoFileClip(str(video_file))
-    truncated_list = sorted_processed_scene_list[: config.scene_limit]
+    top = order[: config.scene_limit]
+    truncated_list = [processed_scene_list[j] for j in top]
 
     logging.info("Truncated sorted scenes list:")
-    for i, scene in enumerate(truncated_list, start=1):
+    for i, j in enumerate(top, start=1):
         logging.info(
             "    Scene %2d: Duration %d Start %s / Frame %d, End %s / Frame %d",
             i,
-            scene[1].get_seconds() - scene[0].get_seconds(),
-            scene[0].get_timecode(),
-            scene[0].get_frames(),
-            scene[1].get_timecode(),
-            scene[1].get_frames(),
+            *summaries[j],
         )
 
     if truncated_list:
+        tasks: List[Tuple[float, int, str]] = []
         for i, scene in enumerate(truncated_list):
             duration = math.floor(scene[1].get_seconds() - scene[0].get_seconds())
             short_length = random.randint(
@@ -855,44 +1807,59 @@ def process_video(video_file: Path, config: ProcessingConfig, output_dir: Path)
                 short_length,
             )
 
-            final_clip = get_final_clip(
-                video_clip,
-                best_start,
-                short_length,
-                config,
-            )
-
             render_file_name = f"{video_file.stem} scene-{i}{video_file.suffix}"
-            render_video(
-                final_clip,
-                Path(render_file_name),
-                output_dir,
-                max_error_depth=config.max_error_depth,
-            )
-    else:
-        short_length = random.randint(config.min_short_length, config.max_short_length)
+            tasks.append((best_start, short_length, render_file_name))
+        return tasks
 
-        if video_clip.duration < config.max_short_length:
-            adapted_short_length = min(math.floor(video_clip.duration), short_length)
-        else:
-            adapted_short_length = short_length
+    duration = probe_video(video_file).duration
+    short_length = random.randint(config.min_short_length, config.max_short_length)
 
-        min_start_point = min(
-            10, math.floor(video_clip.duration) - adapted_short_length
-        )
-        max_start_point = math.floor(video_clip.duration - adapted_short_length)
-        final_clip = get_final_clip(
-            video_clip,
+    if duration < config.max_short_length:
+        adapted_short_length = min(math.floor(duration), short_length)
+    else:
+        adapted_short_length = short_length
+
+    min_start_point = min(10, math.floor(duration) - adapted_short_length)
+    max_start_point = math.floor(duration - adapted_short_length)
+    return [
+        (
             random.randint(min_start_point, max_start_point),
             adapted_short_length,
-            config,
-        )
-        render_video(
-            final_clip,
-            video_file,
-            output_dir,
-            max_error_depth=config.max_error_depth,
+            video_file.name,
         )
+    ]
+
+
+def process_video(video_file: Path, config: ProcessingConfig, output_dir: Path) -> None:
+    """Process a single video file and generate short clips."""
+
+    render_scenes(video_file, plan_shorts(video_file, config), config, output_dir)
+
+
+def process_videos(
+    video_files: Sequence[Path], config: ProcessingConfig, output_dir: Path
+) -> None:
+    """Process ``video_files`` in order, analysing one ahead of rendering.
+
+    Analysis of the next video (scene detection and action profiles) runs on a
+    background thread while the shorts of the current one are rendered, which
+    mostly waits on ffmpeg processes.
+
+    The render worker processes are started once and shared by all videos,
+    so each worker sets up the interpreter and imports this module (moviepy,
+    scenedetect, librosa) once per run rather than once per video.
+    """
+
+    pool = render_pool(config.render_workers) if config.render_workers > 1 else None
+    with pool or nullcontext() as executor, ThreadPoolExecutor(1) as planner:
+        pending = None
+        if video_files:
+            pending = planner.submit(plan_shorts, video_files[0], config)
+        for i, video_file in enumerate(video_files):
+            tasks = pending.result()
+            if i + 1 < len(video_files):
+                pending = planner.submit(plan_shorts, video_files[i + 1], config)
+            render_scenes(video_file, tasks, config, output_dir, executor)
 
 
 def parse_args() -> argparse.Namespace:
@@ -917,6 +1884,10 @@ def config_from_env() -> ProcessingConfig:
       - MIN_SHORT_LENGTH (int)
       - MAX_SHORT_LENGTH (int)
       - MAX_COMBINED_SCENE_LENGTH (int)
+      - RENDER_WORKERS (int)
+      - SCENE_FRAME_SKIP (int)
+      - VIDEO_CODEC (str)
+      - VIDEO_PRESET (str)
     """
 
     return ProcessingConfig(
@@ -929,6 +1900,10 @@ def config_from_env() -> ProcessingConfig:
         min_short_length=_get_env_int("MIN_SHORT_LENGTH", 15),
         max_short_length=_get_env_int("MAX_SHORT_LENGTH", 179),
         max_combined_scene_length=_get_env_int("MAX_COMBINED_SCENE_LENGTH", 300),
+        render_workers=_get_env_int("RENDER_WORKERS", 2),
+        scene_frame_skip=_get_env_int("SCENE_FRAME_SKIP", 1),
+        video_codec=_get_env_str("VIDEO_CODEC", "auto"),
+        video_preset=_get_env_str("VIDEO_PRESET", "veryfast"),
     )
 
 
@@ -936,14 +1911,19 @@ def main() -> None:
     """Entry point for command-line execution."""
 
     _ = parse_args()
+    # Load environment variables from a .env file if present. This happens here
+    # rather than at import so importing the module (tests, render worker
+    # processes) leaves the environment untouched.
+    load_dotenv()
     config = config_from_env()
     output_dir = Path("generated")
     output_dir.mkdir(exist_ok=True)
 
-    gameplay_dir = Path("gameplay")
-    for video_file in gameplay_dir.iterdir():
-        if video_file.is_file():
-            process_video(video_file, config, output_dir)
+    # DirEntry.is_file() answers from the directory listing on most platforms
+    # instead of a stat() call per entry.
+    with os.scandir("gameplay") as entries:
+        video_files = [Path(entry.path) for entry in entries if entry.is_file()]
+    process_videos(video_files, config, output_dir)
 
 
 if __name__ == "__main__":  # pragma: no cover - CLI entry point
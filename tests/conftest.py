@@ -0,0 +1,39 @@
+"""Test setup shared by every test module.
+
+This runs before pytest imports the test modules, so the stubs below are in
+place by the time they import ``shorts``.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+# Ensure the project root is on the import path.
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# Stub scenedetect to avoid heavy OpenCV dependency during import.
+scenedetect_stub = types.ModuleType("scenedetect")
+scenedetect_stub.FrameTimecode = object  # type: ignore
+scenedetect_stub.SceneManager = object  # type: ignore
+scenedetect_stub.open_video = lambda *_args, **_kwargs: None  # type: ignore
+
+detectors_stub = types.ModuleType("scenedetect.detectors")
+detectors_stub.ContentDetector = object  # type: ignore
+
+sys.modules.setdefault("scenedetect", scenedetect_stub)
+sys.modules.setdefault("scenedetect.detectors", detectors_stub)
+
+
+@pytest.fixture(autouse=True)
+def no_nvenc(monkeypatch):
+    """Report NVENC as unavailable unless a test says otherwise.
+
+    ``nvenc_available`` would otherwise run a real ffmpeg probe (with a long
+    timeout) and cache its machine-dependent answer for later tests.
+    """
+
+    import shorts
+
+    monkeypatch.setattr(shorts, "nvenc_available", lambda: False)
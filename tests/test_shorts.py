@@ -1,39 +1,41 @@
-import numpy as np
-import pytest
+import copy
+import subprocess
 from pathlib import Path
-from unittest.mock import MagicMock
 
+import librosa
+import numpy as np
+import pytest
 from moviepy import ColorClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
 
-# Ensure the project root is on the import path.
-import sys
-import types
-
-sys.path.append(str(Path(__file__).resolve().parent.parent))
-
-# Stub scenedetect to avoid heavy OpenCV dependency during import.
-scenedetect_stub = types.ModuleType("scenedetect")
-scenedetect_stub.SceneManager = object  # type: ignore
-scenedetect_stub.open_video = lambda *_args, **_kwargs: None  # type: ignore
-
-detectors_stub = types.ModuleType("scenedetect.detectors")
-detectors_stub.ContentDetector = object  # type: ignore
-
-sys.modules.setdefault("scenedetect", scenedetect_stub)
-sys.modules.setdefault("scenedetect.detectors", detectors_stub)
-
-import shorts  # noqa: E402
-from shorts import (  # noqa: E402
+import shorts
+from shorts import (
+    CropBox,
+    ProcessingConfig,
+    VideoInfo,
+    best_action_window_start,
     blur,
+    blurred_background,
+    build_filter_graph,
     combine_scenes,
+    compute_audio_action_profile,
+    compute_video_action_profile,
     crop_clip,
-    select_background_resolution,
-    ProcessingConfig,
+    detect_video_scenes,
+    encoder_threads,
+    fill_background,
+    get_final_clip,
+    process_videos,
+    render_scene,
+    render_scenes,
     render_video,
+    render_with_filter_graph,
+    resize_frame,
     scene_action_score,
-    best_action_window_start,
-    compute_audio_action_profile,
-    compute_video_action_profile,
+    scene_action_scores,
+    select_background_resolution,
+    video_encoder,
 )
 
 
@@ -42,40 +44,242 @@ class MockTime:
 
     def __init__(self, seconds: float):
         self._seconds = seconds
+        # Derived values are fixed, so they are computed once here.
+        self._timecode = str(seconds)
+        self._frames = int(seconds * 30)
 
     def get_seconds(self) -> float:
         return self._seconds
 
     # The functions below are unused in logic but required by combine_scenes
     def get_timecode(self) -> str:
-        return str(self._seconds)
+        return self._timecode
 
     def get_frames(self) -> int:
-        return int(self._seconds * 30)
+        return self._frames
 
 
 def make_scene(start: float, end: float):
     return (MockTime(start), MockTime(end))
 
 
+class MockFrameTimecode:
+    """Stand-in for scenedetect's FrameTimecode built from a frame number."""
+
+    def __init__(self, timecode: int, fps: float):
+        self._frames = int(timecode)
+        self._fps = fps
+
+    def get_frames(self) -> int:
+        return self._frames
+
+    def get_framerate(self) -> float:
+        return self._fps
+
+
+def stub_scene_detection(monkeypatch):
+    """Patch scenedetect so detection yields one 0-90 frame scene at 30 fps.
+
+    Returns the list that records the ``frame_skip`` of every detection run.
+    """
+
+    detections = []
+
+    class SceneManagerStub:
+        def add_detector(self, detector):
+            pass
+
+        def detect_scenes(self, video, frame_skip=0, show_progress=True):
+            detections.append(frame_skip)
+
+        def get_scene_list(self):
+            return [(MockFrameTimecode(0, 30.0), MockFrameTimecode(90, 30.0))]
+
+    monkeypatch.setattr(shorts, "SceneManager", SceneManagerStub)
+    monkeypatch.setattr(shorts, "ContentDetector", lambda threshold: None)
+    monkeypatch.setattr(shorts, "open_video", lambda path: path)
+    monkeypatch.setattr(shorts, "FrameTimecode", MockFrameTimecode)
+    return detections
+
+
+class MockClip:
+    """Clip stand-in whose ``write_videofile`` calls follow ``outcomes``.
+
+    Each call records its keyword arguments and takes the next outcome
+    (the last one repeats); exceptions are raised, anything else returned.
+    """
+
+    def __init__(self, fps=30, outcomes=(None,)):
+        self.fps = fps
+        self.outcomes = list(outcomes)
+        self.write_calls = []
+        self.close_calls = 0
+
+    def write_videofile(self, *args, **kwargs):
+        self.write_calls.append(kwargs)
+        outcome = self.outcomes[min(len(self.write_calls), len(self.outcomes)) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def close(self):
+        self.close_calls += 1
+
+
+class SizedClip:
+    """Bare clip for geometry tests: a size and a black frame for every ``t``."""
+
+    def __init__(self, width: int, height: int):
+        self.size = (width, height)
+        self.frame_function = lambda t: np.zeros((height, width, 3), np.uint8)
+
+    def get_frame(self, t: float) -> np.ndarray:
+        return self.frame_function(t)
+
+    def copy(self):
+        return copy.copy(self)
+
+
 def test_select_background_resolution():
     assert select_background_resolution(800) == (720, 1280)
     assert select_background_resolution(1500) == (1440, 2560)
     assert select_background_resolution(2100) == (2160, 3840)
+    # Limits are exclusive upper bounds.
+    assert select_background_resolution(839) == (720, 1280)
+    assert select_background_resolution(840) == (900, 1600)
+    assert select_background_resolution(2039) == (1800, 3200)
+    assert select_background_resolution(2040) == (2160, 3840)
+
+
+def test_detect_video_scenes_uses_cache(monkeypatch, tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"not really a video")
+    detections = stub_scene_detection(monkeypatch)
+
+    cache_dir = tmp_path / "cache"
+    detect_video_scenes(video, cache_dir=cache_dir)
+    cached = detect_video_scenes(video, cache_dir=cache_dir)
+
+    assert len(detections) == 1
+    assert [(s.get_frames(), e.get_frames()) for s, e in cached] == [(0, 90)]
+    assert cached[0][0].get_framerate() == 30.0
+
+    detect_video_scenes(video, cache_dir=cache_dir, frame_skip=2)
+    assert detections == [0, 2]
+
+
+@pytest.mark.parametrize("content", ["", "{not json", "[]", '{"fps": 30.0}'])
+def test_detect_video_scenes_ignores_corrupt_cache(
+    monkeypatch, tmp_path, caplog, content
+):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"not really a video")
+    detections = stub_scene_detection(monkeypatch)
+
+    cache_dir = tmp_path / "cache"
+    cache_file = shorts._scene_cache_file(video, 27.0, 0, cache_dir)
+    cache_dir.mkdir()
+    cache_file.write_text(content)
+
+    scenes = detect_video_scenes(video, cache_dir=cache_dir)
+
+    assert "Ignoring unreadable scene cache" in caplog.text
+    assert detections == [0]
+    assert [(s.get_frames(), e.get_frames()) for s, e in scenes] == [(0, 90)]
 
 
 def test_crop_clip_to_square():
-    clip = ColorClip(size=(1920, 1080), color=(255, 0, 0), duration=1)
+    clip = SizedClip(1920, 1080)
     cropped = crop_clip(clip, 1, 1, 0.5, 0.5)
     assert cropped.size == (1080, 1080)
+    assert cropped.get_frame(0).shape == (1080, 1080, 3)
+
+
+def test_crop_box_stays_inside_frame():
+    box = CropBox.for_ratio((1920, 1080), 1, 1, 0.95, 0.5)
+    assert (box.x0, box.y0, box.x1, box.y1) == (840, 0, 1920, 1080)
+
+
+def test_get_final_clip_square_skips_background():
+    clip = ColorClip(size=(1920, 1080), color=(255, 0, 0), duration=2)
+    config = ProcessingConfig(target_ratio_w=1, target_ratio_h=1)
+    final = get_final_clip(clip, 0, 1, config)
+    assert final.size == (1080, 1080)
+    assert np.all(final.get_frame(0.5) == (255, 0, 0))
+
+
+def test_get_final_clip_landscape_fills_background():
+    clip = ColorClip(size=(1920, 1080), color=(255, 0, 0), duration=2)
+    config = ProcessingConfig(target_ratio_w=16, target_ratio_h=9)
+    final = get_final_clip(clip, 0, 1, config)
+    assert final.size == (1800, 1800)
+    assert final.get_frame(0.5).shape == (1800, 1800, 3)
+
+
+def test_resize_frame_picks_size():
+    frame = np.zeros((90, 160, 3), dtype=np.uint8)
+    assert resize_frame(frame, (80, 45)).shape == (45, 80, 3)
+    assert resize_frame(frame, (320, 180)).shape == (180, 320, 3)
+
+
+def test_get_final_clip_renders_no_frames_while_building():
+    clip = ColorClip(size=(1920, 1080), color=(255, 0, 0), duration=2)
+    calls = []
+    frame_function = clip.frame_function
+    clip.frame_function = lambda t: calls.append(t) or frame_function(t)
+    config = ProcessingConfig(target_ratio_w=16, target_ratio_h=9)
+
+    final = get_final_clip(clip, 0, 1, config)
+
+    assert calls == []
+    assert final.get_frame(0).shape == (1800, 1800, 3)
 
 
-def test_blur_changes_image():
-    image = np.zeros((10, 10))
-    image[5, 5] = 1.0
-    blurred = blur(image)
-    assert blurred.shape == image.shape
-    assert blurred[5, 5] != image[5, 5]
+def test_fill_background_centres_frame():
+    frame = np.full((90, 160, 3), 200, dtype=np.uint8)
+    box = CropBox.for_ratio((160, 90), 1, 1, 0.5, 0.5)
+    filled = fill_background(frame, (320, 320), (32, 32), box)
+    assert filled.shape == (320, 320, 3)
+    assert np.all(filled[115:205, 80:240] == 200)
+
+
+# Single bright pixel shared by the blur tests; read-only so a blur that
+# wrote into its input would fail loudly instead of leaking between tests.
+_BLUR_FIXTURE = np.zeros((10, 10))
+_BLUR_FIXTURE[5, 5] = 1.0
+_BLUR_FIXTURE.flags.writeable = False
+
+
+@pytest.mark.parametrize("sigma", [1, 2, 8])
+def test_blur_changes_image(sigma):
+    blurred = blur(_BLUR_FIXTURE, sigma=sigma)
+    assert blurred.shape == _BLUR_FIXTURE.shape
+    assert blurred[5, 5] != _BLUR_FIXTURE[5, 5]
+
+
+def test_blur_keeps_uint8_frames():
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    frame[16, 16] = 255
+    blurred = blur(frame)
+    assert blurred.dtype == np.uint8
+    assert blurred.shape == frame.shape
+
+
+def test_blur_writes_into_out_buffer():
+    frame = np.random.default_rng(0).integers(0, 255, (32, 32, 3), dtype=np.uint8)
+    expected = blur(frame)
+    buf = np.empty_like(frame)
+    assert blur(frame, out=buf) is buf
+    np.testing.assert_array_equal(buf, expected)
+    assert blur(frame, out=frame) is frame
+    np.testing.assert_array_equal(frame, expected)
+
+
+def test_blurred_background_resizes_to_output():
+    frame = np.random.default_rng(0).integers(0, 255, (1080, 608, 3), dtype=np.uint8)
+    background = blurred_background(frame, (180, 320), (720, 1280))
+    assert background.shape == (1280, 720, 3)
+    assert background.dtype == np.uint8
 
 
 def test_combine_scenes_merges_short_scenes():
@@ -98,22 +302,343 @@ def test_combine_scenes_merges_short_scenes():
 
 
 def test_render_video_retries(tmp_path):
-    clip = MagicMock()
-    clip.fps = 30
-    clip.write_videofile.side_effect = [Exception("boom"), None]
+    clip = MockClip(fps=30, outcomes=[OSError("boom"), None])
     render_video(clip, Path("out.mp4"), tmp_path, max_error_depth=1)
-    assert clip.write_videofile.call_count == 2
+    assert len(clip.write_calls) == 2
+
+
+def test_render_video_uses_nvenc_when_available(monkeypatch, tmp_path):
+    monkeypatch.setattr(shorts, "nvenc_available", lambda: True)
+    clip = MockClip(fps=30)
+    render_video(clip, Path("out.mp4"), tmp_path, max_error_depth=0)
+    assert clip.write_calls[-1]["codec"] == "h264_nvenc"
+
+
+def test_render_video_writes_faststart_mp4(monkeypatch, tmp_path):
+    monkeypatch.setattr(shorts, "TEMP_AUDIO_DIR", tmp_path)
+    clip = MockClip(fps=30)
+    render_video(clip, Path("out.mp4"), tmp_path, max_error_depth=0)
+    kwargs = clip.write_calls[-1]
+    assert kwargs["ffmpeg_params"] == ["-movflags", "+faststart"]
+    assert kwargs["temp_audiofile_path"] == str(tmp_path)
+
+
+def test_render_video_keeps_temp_audio_beside_output_without_tmpfs(
+    monkeypatch, tmp_path
+):
+    monkeypatch.setattr(shorts, "TEMP_AUDIO_DIR", tmp_path / "missing")
+    output_dir = tmp_path / "generated"
+    clip = MockClip(fps=30)
+    render_video(clip, Path("out.mp4"), output_dir, max_error_depth=0)
+    assert clip.write_calls[-1]["temp_audiofile_path"] == str(output_dir)
+
+
+def test_video_encoder_honours_configured_codec():
+    assert video_encoder(ProcessingConfig()) == ("libx264", "veryfast", [])
+    config = ProcessingConfig(video_codec="h264_qsv", video_preset="faster")
+    assert video_encoder(config) == ("h264_qsv", "faster", [])
 
 
 def test_render_video_raises_after_retries(tmp_path):
-    clip = MagicMock()
-    clip.fps = 60
-    clip.write_videofile.side_effect = Exception("fail")
+    clip = MockClip(fps=60, outcomes=[OSError("fail")])
 
-    with pytest.raises(Exception):
+    with pytest.raises(OSError):
         render_video(clip, Path("out.mp4"), tmp_path, max_error_depth=0)
 
 
+def test_render_video_negative_depth_makes_one_attempt(tmp_path):
+    clip = MockClip(fps=30)
+    render_video(clip, Path("out.mp4"), tmp_path, max_error_depth=-1)
+    assert len(clip.write_calls) == 1
+
+    failing = MockClip(fps=30, outcomes=[OSError("fail"), None])
+    with pytest.raises(OSError):
+        render_video(failing, Path("out.mp4"), tmp_path, max_error_depth=-1)
+    assert len(failing.write_calls) == 1
+
+
+def test_render_video_does_not_retry_logic_errors(tmp_path):
+    clip = MockClip(fps=30, outcomes=[ValueError("bug")])
+
+    with pytest.raises(ValueError):
+        render_video(clip, Path("out.mp4"), tmp_path, max_error_depth=3)
+    assert len(clip.write_calls) == 1
+
+
+def test_frame_prefetcher_serves_frames_in_order():
+    def get_frame(t):
+        return np.full((2, 2, 3), round(t * 10), dtype=np.uint8)
+
+    prefetcher = shorts._FramePrefetcher(get_frame, duration=1.0, fps=10)
+    frames = [prefetcher(i / 10) for i in range(10)]
+    # Repeated and out-of-order requests are still answered correctly.
+    assert prefetcher(0.9)[0, 0, 0] == 9
+    assert prefetcher(0.5)[0, 0, 0] == 5
+    prefetcher.close()
+
+    assert [int(frame[0, 0, 0]) for frame in frames] == list(range(10))
+
+
+def test_build_filter_graph_square_is_a_plain_crop():
+    config = ProcessingConfig(target_ratio_w=1, target_ratio_h=1)
+    graph = build_filter_graph((1920, 1080), 30, config)
+    assert graph == "[0:v]crop=1080:1080:420:0[v]"
+
+
+def test_build_filter_graph_landscape_overlays_background():
+    config = ProcessingConfig(target_ratio_w=16, target_ratio_h=9)
+    graph = build_filter_graph((1920, 1080), 60, config)
+    assert graph.startswith("[0:v]scale=1800:1012:flags=area,split[fg][full];")
+    assert "gblur" in graph
+    assert graph.endswith("overlay=(W-w)/2:(H-h)/2[v]")
+
+
+def test_build_filter_graph_keeps_foreground_height_even():
+    # 1250 * 900 / 1000 = 1125; libx264 rejects odd heights in yuv420p.
+    config = ProcessingConfig(target_ratio_w=1, target_ratio_h=1)
+    graph = build_filter_graph((1000, 1250), 30, config)
+    assert graph == "[0:v]scale=900:1124:flags=area[v]"
+
+
+def test_get_final_clip_matches_even_filter_graph_size():
+    clip = ColorClip(size=(1000, 1250), color=(255, 0, 0), duration=2)
+    config = ProcessingConfig(target_ratio_w=1, target_ratio_h=1)
+    final = get_final_clip(clip, 0, 1, config)
+    assert final.size == (900, 1124)
+    assert final.get_frame(0.5).shape == (1124, 900, 3)
+
+
+def test_render_with_filter_graph_seeks_on_input(monkeypatch, tmp_path):
+    commands = []
+    monkeypatch.setattr(
+        shorts.subprocess, "run", lambda cmd, **kwargs: commands.append(cmd)
+    )
+
+    render_with_filter_graph(
+        Path("video.mp4"), 600.0, 30, "[0:v]null[v]", tmp_path / "a.mp4"
+    )
+
+    cmd = commands[0]
+    input_index = cmd.index("-i")
+    assert cmd[cmd.index("-ss") + 1] == "600.0"
+    assert cmd.index("-ss") < input_index
+    assert cmd.index("-t") < input_index
+
+
+def test_build_filter_graph_matching_source_needs_no_filters():
+    config = ProcessingConfig(target_ratio_w=9, target_ratio_h=16)
+    assert build_filter_graph((720, 1280), 30, config) is None
+
+
+def test_render_with_filter_graph_copies_unfiltered_streams(monkeypatch, tmp_path):
+    commands = []
+    monkeypatch.setattr(
+        shorts.subprocess, "run", lambda cmd, **kwargs: commands.append(cmd)
+    )
+    monkeypatch.setattr(shorts, "starts_on_keyframe", lambda path, start: True)
+
+    render_with_filter_graph(Path("video.mp4"), 5.0, 30, None, tmp_path / "a.mp4")
+
+    cmd = commands[0]
+    assert cmd[cmd.index("-c") + 1] == "copy"
+    assert "-filter_complex" not in cmd
+
+
+def test_render_with_filter_graph_reencodes_unsafe_copies(monkeypatch, tmp_path):
+    commands = []
+    monkeypatch.setattr(
+        shorts.subprocess, "run", lambda cmd, **kwargs: commands.append(cmd)
+    )
+    keyframe = {"value": True}
+    monkeypatch.setattr(
+        shorts, "starts_on_keyframe", lambda path, start: keyframe["value"]
+    )
+
+    # MKV has no edit list to hide a lead-in, even from a keyframe.
+    render_with_filter_graph(Path("video.mkv"), 5.0, 30, None, tmp_path / "a.mkv")
+    keyframe["value"] = False
+    render_with_filter_graph(Path("video.mp4"), 5.0, 30, None, tmp_path / "a.mp4")
+
+    for cmd in commands:
+        assert "copy" not in cmd
+        assert cmd[cmd.index("-c:v") + 1] == "libx264"
+        assert "-filter_complex" not in cmd
+
+
+def _make_test_video(path: Path) -> None:
+    """Write 8 s of 30 fps test pattern with a keyframe every 2 s to ``path``."""
+
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "testsrc=size=160x120:rate=30",
+            "-t",
+            "8",
+            "-c:v",
+            "libx264",
+            "-g",
+            "60",
+            "-sc_threshold",
+            "0",
+            str(path),
+        ],
+        check=True,
+    )
+
+
+def test_starts_on_keyframe_detects_gop_boundaries(tmp_path):
+    video = tmp_path / "source.mkv"
+    _make_test_video(video)
+
+    assert shorts.starts_on_keyframe(video, 2.0)
+    assert not shorts.starts_on_keyframe(video, 3.0)
+
+
+def test_unfiltered_mkv_cut_keeps_its_duration(tmp_path):
+    video = tmp_path / "source.mkv"
+    _make_test_video(video)
+    output = tmp_path / "cut.mkv"
+
+    # 3.0 s is mid-GOP: a stream copy would start at the 2.0 s keyframe.
+    render_with_filter_graph(video, 3.0, 2, None, output)
+
+    assert ffmpeg_parse_infos(str(output))["duration"] == pytest.approx(2.0, abs=0.05)
+
+
+@pytest.mark.parametrize("rotation", [90, -90, 270, -270])
+def test_probe_video_swaps_size_for_rotated_video(monkeypatch, rotation):
+    infos = {
+        "video_size": [1920, 1080],
+        "video_fps": 30.0,
+        "duration": 12.0,
+        "video_rotation": rotation,
+    }
+    monkeypatch.setattr(shorts, "ffmpeg_parse_infos", lambda path: infos)
+    shorts.probe_video.cache_clear()
+
+    assert shorts.probe_video(Path("phone.mp4")).size == (1080, 1920)
+    shorts.probe_video.cache_clear()
+
+
+def test_encoder_threads_splits_cores(monkeypatch):
+    monkeypatch.setattr(shorts.os, "cpu_count", lambda: 8)
+    assert encoder_threads(2) == 4
+    assert encoder_threads(16) == 1
+
+
+def test_render_scene_does_not_open_clip_for_ffmpeg(monkeypatch, tmp_path):
+    def no_clip(path):
+        raise AssertionError("VideoFileClip should not be opened")
+
+    monkeypatch.setattr(shorts, "VideoFileClip", no_clip)
+    monkeypatch.setattr(
+        shorts, "probe_video", lambda path: VideoInfo((1920, 1080), 30.0, 60.0)
+    )
+    calls = []
+    monkeypatch.setattr(
+        shorts,
+        "render_with_filter_graph",
+        lambda *args, **kwargs: calls.append(args),
+    )
+
+    render_scene(Path("video.mp4"), 1.0, 15, "a.mp4", ProcessingConfig(), tmp_path)
+
+    assert calls[0][4] == tmp_path / "a.mp4"
+
+
+def test_render_scene_falls_back_to_moviepy(monkeypatch, tmp_path):
+    clip = MockClip()
+    monkeypatch.setattr(shorts, "VideoFileClip", lambda path: clip)
+    monkeypatch.setattr(
+        shorts, "probe_video", lambda path: VideoInfo((1920, 1080), 30.0, 60.0)
+    )
+
+    def failing_render(*args, **kwargs):
+        raise subprocess.CalledProcessError(1, "ffmpeg", stderr=b"boom")
+
+    monkeypatch.setattr(shorts, "render_with_filter_graph", failing_render)
+    monkeypatch.setattr(shorts, "get_final_clip", lambda *args: "final")
+    rendered = []
+    monkeypatch.setattr(
+        shorts, "render_video", lambda final, *args, **kwargs: rendered.append(final)
+    )
+
+    render_scene(Path("video.mp4"), 1.0, 15, "a.mp4", ProcessingConfig(), tmp_path)
+
+    assert rendered == ["final"]
+    assert clip.close_calls == 1
+
+
+def test_render_scene_without_fps_falls_back_to_moviepy(monkeypatch, tmp_path):
+    infos = {"video_size": [1920, 1080], "duration": 60.0}
+    monkeypatch.setattr(shorts, "ffmpeg_parse_infos", lambda path: infos)
+    shorts.probe_video.cache_clear()
+    monkeypatch.setattr(shorts, "VideoFileClip", lambda path: MockClip())
+
+    def unexpected_render(*args, **kwargs):  # pragma: no cover - must not run
+        raise AssertionError("filter graph render needs a frame rate")
+
+    monkeypatch.setattr(shorts, "render_with_filter_graph", unexpected_render)
+    monkeypatch.setattr(shorts, "get_final_clip", lambda *args: "final")
+    rendered = []
+    monkeypatch.setattr(
+        shorts, "render_video", lambda final, *args, **kwargs: rendered.append(final)
+    )
+
+    render_scene(Path("nofps.mp4"), 1.0, 15, "a.mp4", ProcessingConfig(), tmp_path)
+
+    assert rendered == ["final"]
+    shorts.probe_video.cache_clear()
+
+
+def test_render_scenes_single_worker_runs_in_process(monkeypatch, tmp_path):
+    rendered = []
+
+    def fake_render_scene(video_file, start, length, name, config, output_dir):
+        rendered.append((start, length, name))
+
+    monkeypatch.setattr(shorts, "render_scene", fake_render_scene)
+    config = ProcessingConfig(render_workers=1)
+    tasks = [(1.0, 15, "a.mp4"), (20.0, 30, "b.mp4")]
+
+    render_scenes(Path("video.mp4"), tasks, config, tmp_path)
+
+    assert rendered == tasks
+
+
+def test_render_pool_spawns_workers():
+    # Forking while the analysis thread runs could deadlock the workers.
+    with shorts.render_pool(2) as pool:
+        assert pool._mp_context.get_start_method() == "spawn"
+
+
+def test_process_videos_renders_in_order(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        shorts, "plan_shorts", lambda video, config: [(0.0, 15, video.name)]
+    )
+    rendered = []
+    executors = set()
+
+    def fake_render_scenes(video, tasks, config, output_dir, executor=None):
+        rendered.append(tasks[0][2])
+        executors.add(executor)
+
+    monkeypatch.setattr(shorts, "render_scenes", fake_render_scenes)
+
+    videos = [Path("a.mp4"), Path("b.mp4"), Path("c.mp4")]
+    process_videos(videos, ProcessingConfig(render_workers=2), tmp_path)
+
+    assert rendered == ["a.mp4", "b.mp4", "c.mp4"]
+    # One render pool is shared by all videos.
+    assert len(executors) == 1 and None not in executors
+
+
 def test_scene_action_score_sum():
     times = np.array([0, 1, 2, 3, 4, 5, 6], dtype=float)
     score = np.array([0, 10, 10, 10, 0, 0, 0], dtype=float)
@@ -136,27 +661,31 @@ def test_scene_action_score_invalid_range():
     assert scene_action_score(scene, times, score) == 0.0
 
 
+def test_scene_action_scores_matches_per_scene_scores():
+    times = np.arange(0.0, 10.0, 0.5)
+    score = np.sin(times)
+    video_times = np.arange(0.0, 10.0, 1.0)
+    video_score = np.cos(video_times)
+    scenes = [make_scene(0.0, 3.0), make_scene(2.5, 7.25), make_scene(6.0, 6.0)]
+
+    totals = scene_action_scores(scenes, times, score, video_times, video_score)
+
+    expected = [
+        scene_action_score(scene, times, score, video_times, video_score)
+        for scene in scenes
+    ]
+    np.testing.assert_allclose(totals, expected)
+    assert totals[0] == pytest.approx(
+        0.6 * score[:6].sum() + 0.4 * video_score[:3].sum()
+    )
+    assert totals[2] == 0.0
+
+
 def test_compute_audio_action_profile_stubbed(monkeypatch):
     class LibrosaStub:
         def load(self, path, sr=None, mono=True):
-            return np.zeros(1000, dtype=float), 100
-
-        class feature:
-            @staticmethod
-            def rms(y, frame_length=2048, hop_length=512):
-                # Return shape (1, n_frames)
-                return np.array([[1.0, 2.0, 3.0]], dtype=float)
-
-        @staticmethod
-        def stft(y, n_fft=2048, hop_length=512):
-            # Shape (freq_bins, n_frames)
-            return np.array(
-                [
-                    [1.0, 2.0, 3.0],
-                    [1.0, 2.0, 3.0],
-                ],
-                dtype=float,
-            )
+            # 1200 samples give 3 centred frames with hop_length=512.
+            return np.linspace(0.0, 1.0, 1200, dtype=np.float32), 100
 
         @staticmethod
         def frames_to_time(frames, sr=100, hop_length=512):
@@ -174,6 +703,35 @@ def test_compute_audio_action_profile_stubbed(monkeypatch):
     assert score.std() > 0
 
 
+def test_frame_rms_matches_librosa():
+    y = np.random.default_rng(0).standard_normal(5000).astype(np.float32)
+    expected = librosa.feature.rms(y=y, frame_length=2048, hop_length=512)[0]
+    np.testing.assert_allclose(shorts._frame_rms(y, 2048, 512), expected, rtol=1e-5)
+    expected = librosa.feature.rms(y=y, frame_length=1000, hop_length=512)[0]
+    np.testing.assert_allclose(shorts._frame_rms(y, 1000, 512), expected, rtol=1e-5)
+
+
+def test_spectral_flux_matches_librosa_stft():
+    y = np.random.default_rng(0).standard_normal(6000).astype(np.float32)
+    magnitude = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))
+    expected = np.concatenate(
+        [[0.0], np.sqrt((np.diff(magnitude, axis=1) ** 2).sum(axis=0))]
+    )
+    # Small blocks so differences across block boundaries are covered.
+    flux = shorts._spectral_flux(y, 2048, 512, block_frames=4)
+    np.testing.assert_allclose(flux, expected, rtol=1e-5, atol=1e-4)
+
+
+def test_hann_window_matches_librosa_and_is_cached():
+    window = shorts._hann_window(2048)
+    np.testing.assert_allclose(
+        window, librosa.filters.get_window("hann", 2048), rtol=1e-6, atol=1e-7
+    )
+    assert window.dtype == np.float32
+    assert shorts._hann_window(2048) is window
+    assert not window.flags.writeable
+
+
 def test_best_action_window_start_picks_max_window():
     # times every 1s from 0..19
     times = np.arange(0.0, 20.0, 1.0, dtype=float)
@@ -306,6 +864,69 @@ def test_compute_video_action_profile_zero_duration(monkeypatch):
     assert times.size == 0 and score.size == 0
 
 
+def test_compute_video_action_profile_uses_cache(monkeypatch, tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"not really a video")
+    opened = []
+
+    class VideoStub:
+        duration = 2.0
+        fps = 30
+
+        def __init__(self, path):
+            opened.append(path)
+
+        def iter_frames(self, fps=2.0, dtype="uint8", logger=None):
+            for i in range(int(self.duration * fps)):
+                yield np.full((4, 4, 3), 255 * (i % 2), dtype=np.uint8)
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(shorts, "VideoFileClip", VideoStub)
+
+    cache_dir = tmp_path / "cache"
+    times, score = compute_video_action_profile(video, fps=2, cache_dir=cache_dir)
+    cached_times, cached_score = compute_video_action_profile(
+        video, fps=2, cache_dir=cache_dir
+    )
+
+    assert len(opened) == 1
+    np.testing.assert_array_equal(cached_times, times)
+    np.testing.assert_array_equal(cached_score, score)
+
+    compute_video_action_profile(video, fps=3, cache_dir=cache_dir)
+    assert len(opened) == 2
+
+
+@pytest.mark.parametrize("content", [b"", b"garbage", b"PK\x03\x04garbage"])
+def test_compute_video_action_profile_ignores_corrupt_cache(
+    monkeypatch, tmp_path, caplog, content
+):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"not really a video")
+    measured = []
+
+    def measure(path, fps, downscale_factor):
+        measured.append(path)
+        return np.array([0.0, 0.5]), np.array([0.0, 1.0])
+
+    monkeypatch.setattr(shorts, "_measure_video_motion", measure)
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    key = shorts._video_cache_key(video, "motion", 2, 4)
+    (cache_dir / f"{key}.npz").write_bytes(content)
+
+    times, score = compute_video_action_profile(
+        video, fps=2, downscale_factor=4, cache_dir=cache_dir
+    )
+
+    assert "Ignoring unreadable profile cache" in caplog.text
+    assert measured == [video]
+    np.testing.assert_array_equal(score, [0.0, 1.0])
+
+
 def test_scene_action_score_combines_audio_video():
     # Simple 0..4s with unit audio everywhere and a video spike at t=2
     audio_times = np.array([0.0, 1.0, 2.0, 3.0], dtype=float)